@@ -1,102 +1,472 @@
 # Script: translate-po-multiple.py
 # Purpose: Translates untranslated entries in a PO file using multiple translation APIs
-# Dependencies: polib, deepl, python-dotenv, tqdm, requests, openai, google-cloud-translate
+# Dependencies: polib, deepl, python-dotenv, tqdm, requests, aiohttp, xxhash, openai, google-cloud-translate
+# Optional: google-re2 (linear-time regex engine for the per-string patterns)
 
 import argparse
+import asyncio
+import atexit
+import functools
 import os
 import polib
 from tqdm import tqdm
 from dotenv import load_dotenv
 import requests
+import aiohttp
 import logging
 import time
 import json
 import re
-import hashlib
-import pickle
+import sqlite3
+import threading
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Tuple, Dict, Optional
+import xxhash
+from typing import List, Tuple, Dict, Optional, Sequence, Iterator, Callable
 from openai import OpenAI
 from google.cloud import translate_v3
 
+# Use RE2 for the patterns run on every msgid when available: it matches in
+# linear time with no backtracking. The standard library is the fallback.
+try:
+    import re2 as regex_engine
+except ImportError:
+    regex_engine = re
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Compile regex patterns for better performance
-HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
-VARIABLE_PATTERN = re.compile(r'%[sd]|{[0-9]+}')
-HTML_PLACEHOLDER = '{{HTML}}'
-VAR_PLACEHOLDER = '{{VAR}}'
+# HTML tags and variables are found in a single scan and replaced by numbered placeholders
+HTML_OR_VARIABLE_PATTERN = regex_engine.compile(r'<[^>]+>|%[sd]|\{[0-9]+\}')
+PLACEHOLDER_FORMAT = '{{%d}}'
+PLACEHOLDER_PATTERN = regex_engine.compile(r'\{\{\s*(\d+)\s*\}\}')
+
+# Strings without a word outside URLs and HTML entities are copied, not translated
+# A word is two letters in any script, or a single non-ASCII letter (CJK words can be one character)
+# WORD_PATTERN always uses re: RE2's \w only matches ASCII, so Cyrillic or CJK text would look empty
+NON_TRANSLATABLE_PATTERN = regex_engine.compile(r'https?://\S+|&#?\w+;')
+WORD_PATTERN = re.compile(r'[^\W\d_]{2,}|[^\W\d_a-zA-Z]')
+
+# DeepSeek chat completions endpoint (OpenAI-compatible)
+DEEPSEEK_API_URL = 'https://api.deepseek.com/v1/chat/completions'
+DEEPSEEK_SYSTEM_PROMPT = (
+    "You are a professional translator. Your task is to translate text while preserving HTML tags, "
+    "variables, and placeholders. Do not modify the structure of the text or any technical elements. "
+    "Numbered placeholders such as {{0}} stand for markup and must be kept exactly as written."
+)
+
+# APIs that can translate several strings per request
+BATCH_APIS = ['deepl', 'google', 'deepseek']
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_BATCH_SIZES = {
+    'google': 100,
+}
+
+# Google accepts up to 100 strings per request, within a total payload limit
+GOOGLE_MAX_BATCH_ITEMS = 100
+GOOGLE_MAX_BATCH_BYTES = 28000
+
+# Several msgids are packed into one DeepSeek prompt as numbered, delimited items
+DEEPSEEK_PACK_BUDGET = 3000
+PACKED_ITEM_PATTERN = re.compile(r'(\d+)\.<<<(.*?)>>>', re.DOTALL)
+
+# Shared aiohttp session, created lazily inside the running event loop
+HTTP_TIMEOUT = 30
+HTTP_MAX_CONNECTIONS = 64
+_http_session: Optional[aiohttp.ClientSession] = None
+
+# Map language codes to Google's format if needed
+# Google uses ISO-639-1 language codes
+GOOGLE_LANG_MAPPING = {
+    'es_ES': 'es',
+    'en_US': 'en',
+    'fr_FR': 'fr',
+    # Add more mappings as needed
+}
+
+# Seconds between progress checkpoints
+CHECKPOINT_INTERVAL = 30
+
+# Default request rate per API (requests per second); override with --rate
+API_RATE_LIMITS = {
+    'deepl': 10,
+    'deepseek': 10,
+    'google': 10,
+    'azure': 10,
+}
+_rate_limiter: Optional['RateLimiter'] = None
+
+# Translation cache database
+CACHE_DB = Path('.translation_cache.db')
+CACHE_SCHEMA_VERSION = 2
+CACHE_FLUSH_SIZE = 100
+_cache_db: Optional[sqlite3.Connection] = None
+_cache_lock = threading.Lock()
+_pending_cache_writes: Dict[int, str] = {}
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` requests per second with bursts of up to `burst`.
 
-# Cache directory
-CACHE_DIR = Path('.translation_cache')
-CACHE_DIR.mkdir(exist_ok=True)
+    Callers reserve a token and wait only as long as the bucket is in deficit,
+    so there is no idle time while below the limit. Usable from worker
+    threads (acquire) and from the event loop (acquire_async).
+    """
 
-def get_cache_key(text: str, target_lang: str, api: str) -> str:
-    """Generate a unique cache key for a translation."""
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Takes a token and returns how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def pause(self, seconds: float):
+        """Holds back all requests for the given time, e.g. after a 429 with Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def acquire(self):
+        """Blocks the calling thread until a request may be sent."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Waits on the event loop until a request may be sent."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+def set_rate_limit(rate: Optional[float]):
+    """Limits all API requests to `rate` per second; None or 0 disables limiting."""
+    global _rate_limiter
+    _rate_limiter = RateLimiter(rate) if rate else None
+
+def _throttle():
+    """Waits for the rate limiter, if one is configured."""
+    if _rate_limiter is not None:
+        _rate_limiter.acquire()
+
+async def _throttle_async():
+    """Waits for the rate limiter on the event loop, if one is configured."""
+    if _rate_limiter is not None:
+        await _rate_limiter.acquire_async()
+
+def _retry_after_seconds(value: Optional[str], default: float) -> float:
+    """Parses a Retry-After header given in seconds, falling back to default."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
+
+def _get_http_session(limit: int = HTTP_MAX_CONNECTIONS) -> aiohttp.ClientSession:
+    """Return the shared aiohttp session, creating it on first use."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(limit=limit, ttl_dns_cache=300)
+        _http_session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+        )
+    return _http_session
+
+async def close_http_session():
+    """Close the shared aiohttp session and release its pooled connections."""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+@functools.lru_cache(maxsize=None)
+def _get_deepseek_client() -> OpenAI:
+    """Return the OpenAI client configured for DeepSeek, created once per process."""
+    return OpenAI(
+        api_key=os.getenv('DEEPSEEK_API_KEY'),
+        base_url="https://api.deepseek.com"
+    )
+
+@functools.lru_cache(maxsize=None)
+def _get_google_client() -> translate_v3.TranslationServiceClient:
+    """Return the Google Translation client, created once per process."""
+    return translate_v3.TranslationServiceClient()
+
+@functools.lru_cache(maxsize=None)
+def _get_google_parent() -> str:
+    """Return the Google Translation resource parent for GOOGLE_CLOUD_PROJECT."""
+    project_id = os.getenv('GOOGLE_CLOUD_PROJECT')
+    if not project_id:
+        raise ValueError("GOOGLE_CLOUD_PROJECT environment variable is not set")
+    return f"projects/{project_id}/locations/global"
+
+def _google_lang_code(target_lang: str) -> str:
+    """Map a PO language code such as es_ES to Google's ISO-639-1 code."""
+    return GOOGLE_LANG_MAPPING.get(target_lang, target_lang.split('_')[0].lower())
+
+@functools.lru_cache(maxsize=None)
+def _get_deepl_translator():
+    """Return the DeepL translator, created once per process."""
+    import deepl
+    return deepl.Translator(os.getenv('DEEPL_API_KEY'))
+
+def get_cache_key(text: str, target_lang: str, api: str) -> int:
+    """Generate a unique cache key for a translation as a signed 64-bit integer (SQLite INTEGER range)."""
     content = f"{text}|{target_lang}|{api}"
-    return hashlib.md5(content.encode('utf-8')).hexdigest()
+    return xxhash.xxh3_64_intdigest(content.encode('utf-8')) - (1 << 63)
+
+def _get_cache_db() -> sqlite3.Connection:
+    """Open the translation cache database on first use."""
+    global _cache_db
+    if _cache_db is None:
+        _cache_db = sqlite3.connect(CACHE_DB, check_same_thread=False)
+        _cache_db.execute('PRAGMA journal_mode=WAL')
+        _cache_db.execute('PRAGMA synchronous=NORMAL')
+        # Keys from older schema versions cannot be mapped to the current hash, so start fresh
+        if _cache_db.execute('PRAGMA user_version').fetchone()[0] != CACHE_SCHEMA_VERSION:
+            _cache_db.execute('DROP TABLE IF EXISTS tcache')
+            _cache_db.execute(f'PRAGMA user_version = {CACHE_SCHEMA_VERSION}')
+        _cache_db.execute('CREATE TABLE IF NOT EXISTS tcache(key INTEGER PRIMARY KEY, translation TEXT)')
+    return _cache_db
 
 def get_cached_translation(text: str, target_lang: str, api: str) -> Optional[str]:
     """Retrieve cached translation if available."""
     cache_key = get_cache_key(text, target_lang, api)
-    cache_file = CACHE_DIR / f"{cache_key}.pkl"
 
-    if cache_file.exists():
+    with _cache_lock:
+        pending = _pending_cache_writes.get(cache_key)
+        if pending is not None:
+            return pending
         try:
-            with open(cache_file, 'rb') as f:
-                return pickle.load(f)
-        except Exception as e:
+            row = _get_cache_db().execute('SELECT translation FROM tcache WHERE key=?', (cache_key,)).fetchone()
+        except sqlite3.Error as e:
             logger.warning(f"Failed to load cache: {e}")
             return None
-    return None
+    return row[0] if row else None
 
 def save_to_cache(text: str, target_lang: str, api: str, translation: str):
-    """Save translation to cache."""
+    """Buffer a translation for the cache, writing every CACHE_FLUSH_SIZE entries."""
     cache_key = get_cache_key(text, target_lang, api)
-    cache_file = CACHE_DIR / f"{cache_key}.pkl"
 
+    with _cache_lock:
+        _pending_cache_writes[cache_key] = translation
+        if len(_pending_cache_writes) >= CACHE_FLUSH_SIZE:
+            _flush_pending_cache_writes()
+
+def _flush_pending_cache_writes():
+    """Write buffered translations in one transaction. Caller must hold _cache_lock."""
+    if not _pending_cache_writes:
+        return
     try:
-        with open(cache_file, 'wb') as f:
-            pickle.dump(translation, f)
-    except Exception as e:
+        db = _get_cache_db()
+        with db:
+            db.executemany(
+                'INSERT OR REPLACE INTO tcache(key, translation) VALUES (?, ?)',
+                _pending_cache_writes.items()
+            )
+    except sqlite3.Error as e:
         logger.warning(f"Failed to save to cache: {e}")
+    finally:
+        _pending_cache_writes.clear()
+
+def flush_cache():
+    """Write any buffered translations to the cache database."""
+    with _cache_lock:
+        _flush_pending_cache_writes()
+
+atexit.register(flush_cache)
+
+@functools.lru_cache(maxsize=65536)
+def _mem_translation(text: str, target_lang: str, api: str) -> str:
+    """
+    In-process memo over get_cached_translation for msgids repeated within a run.
 
-def isolate_html_and_variables(text: str) -> Tuple[str, List[str], List[str]]:
+    Misses raise KeyError rather than returning None: lru_cache does not
+    memoize exceptions, so a string saved to the cache later is still found.
     """
-    Isolates HTML tags and variables from a string using compiled regex patterns.
+    translation = get_cached_translation(text, target_lang, api)
+    if translation is None:
+        raise KeyError(text)
+    return translation
+
+def lookup_cached_translation(text: str, target_lang: str, api: str) -> Optional[str]:
+    """Retrieve a cached translation, consulting the in-process memo first."""
+    try:
+        return _mem_translation(text, target_lang, api)
+    except KeyError:
+        return None
+
+@functools.lru_cache(maxsize=65536)
+def isolate_html_and_variables(text: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Isolates HTML tags and variables from a string in a single regex pass.
+    Each one is replaced by a numbered placeholder ({{0}}, {{1}}, ...).
+    Results are memoized, so the isolated items are returned as an immutable tuple.
 
     Args:
         text (str): The string to process.
 
     Returns:
-        tuple: (cleaned_text, html_tags, variables)
+        tuple: (cleaned_text, items) where items[i] is the tag or variable behind {{i}}
     """
-    html_tags = HTML_TAG_PATTERN.findall(text)
-    variables = VARIABLE_PATTERN.findall(text)
-    cleaned_text = HTML_TAG_PATTERN.sub(HTML_PLACEHOLDER, text)
-    cleaned_text = VARIABLE_PATTERN.sub(VAR_PLACEHOLDER, cleaned_text)
-    return cleaned_text, html_tags, variables
+    items = []
+
+    def replace(match: re.Match) -> str:
+        items.append(match.group(0))
+        return PLACEHOLDER_FORMAT % (len(items) - 1)
+
+    cleaned_text = HTML_OR_VARIABLE_PATTERN.sub(replace, text)
+    return cleaned_text, tuple(items)
 
-def reinsert_html_and_variables(text: str, html_tags: List[str], variables: List[str]) -> str:
+def reinsert_html_and_variables(text: str, items: Sequence[str]) -> str:
     """
-    Re-inserts HTML tags and variables into a translated string.
+    Re-inserts HTML tags and variables into a translated string in a single pass.
+    Placeholders with an unknown index are left untouched.
 
     Args:
         text (str): The translated string.
-        html_tags (list): List of HTML tags to re-insert.
-        variables (list): List of variables to re-insert.
+        items (list): Tags and variables returned by isolate_html_and_variables.
 
     Returns:
         str: The reconstructed string.
     """
-    for tag in html_tags:
-        text = text.replace(HTML_PLACEHOLDER, tag, 1)
-    for var in variables:
-        text = text.replace(VAR_PLACEHOLDER, var, 1)
-    return text
+    def replace(match: re.Match) -> str:
+        index = int(match.group(1))
+        return items[index] if index < len(items) else match.group(0)
+
+    return PLACEHOLDER_PATTERN.sub(replace, text)
+
+def is_trivial(text: str) -> bool:
+    """
+    Checks whether a string has nothing for a translation API to translate,
+    e.g. '%s', '1', '&nbsp;', '<br/>' or a bare URL.
+
+    Args:
+        text (str): The source string.
+
+    Returns:
+        bool: True if the string can be copied to msgstr as is.
+    """
+    cleaned_text, _ = isolate_html_and_variables(text)
+    return not WORD_PATTERN.search(NON_TRANSLATABLE_PATTERN.sub(' ', cleaned_text))
+
+def _deepseek_chat(content: str) -> str:
+    """
+    Sends a single chat completion request to DeepSeek, retrying with exponential backoff.
+
+    Args:
+        content (str): The user message to send.
+
+    Returns:
+        str: The content of the first completion choice.
+    """
+    client = _get_deepseek_client()
+
+    max_retries = 3
+    for attempt in range(max_retries):
+        _throttle()
+        try:
+            response = client.chat.completions.create(
+                model="deepseek-chat",
+                messages=[
+                    {"role": "system", "content": DEEPSEEK_SYSTEM_PROMPT},
+                    {"role": "user", "content": content}
+                ],
+                temperature=1.3,  # Added recommended temperature for translations
+                stream=False
+            )
+            # Formatting the full response object is expensive, so only do it when debugging
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Raw API Response: %s", response)
+            return response.choices[0].message.content
+        except Exception as e:
+            if attempt == max_retries - 1:
+                raise Exception(f"Failed after {max_retries} retries: {str(e)}")
+            logger.warning(f"Retrying ({attempt + 1}/{max_retries})... Error: {str(e)}")
+            time.sleep(2 ** attempt)
+
+def _pack(strings: List[str], budget: int = DEEPSEEK_PACK_BUDGET, max_items: Optional[int] = None,
+          size_of: Callable[[str], int] = len) -> Iterator[List[str]]:
+    """
+    Greedily packs strings, in order, into chunks whose combined size stays within budget
+    and, if given, hold at most max_items strings.
+
+    A single string larger than the budget gets a chunk of its own.
+    """
+    buf: List[str] = []
+    size = 0
+    for s in strings:
+        s_size = size_of(s)
+        if buf and (size + s_size > budget or (max_items is not None and len(buf) >= max_items)):
+            yield buf
+            buf = []
+            size = 0
+        buf.append(s)
+        size += s_size
+    if buf:
+        yield buf
+
+def _format_packed_prompt(strings: List[str], target_lang: str) -> str:
+    """Builds a DeepSeek prompt asking for every string to be translated as a numbered item."""
+    items = "\n".join(f"{i}.<<<{s}>>>" for i, s in enumerate(strings, 1))
+    return (
+        f"Translate each numbered item below to {target_lang}. Reply with the same numbered items in the "
+        f"same order, keeping each number and the <<< >>> delimiters exactly as given, and nothing else.\n"
+        f"{items}"
+    )
+
+def _parse_packed_response(content: str, count: int) -> Optional[List[str]]:
+    """
+    Extracts the numbered items from a packed DeepSeek reply.
+
+    Returns:
+        list: The translations in prompt order, or None if any item is missing.
+    """
+    items = {int(number): text for number, text in PACKED_ITEM_PATTERN.findall(content)}
+    if any(i not in items for i in range(1, count + 1)):
+        return None
+    return [items[i] for i in range(1, count + 1)]
+
+def _prepare_batch(strings: List[str], target_lang: str, api: str,
+                   use_cache: bool) -> Tuple[List[Optional[str]], List[str], List[int], List[Tuple[str, ...]]]:
+    """
+    Splits a batch into cached results and strings that still need translating.
+
+    Uncached strings are isolated once here, so retries and fallbacks reuse the
+    cleaned text and placeholder items instead of repeating the regex work.
+
+    Returns:
+        tuple: (results, to_translate, to_translate_indices, to_translate_items) where
+        to_translate holds the cleaned text to send and to_translate_items the
+        tags/variables to reinsert into each translation.
+    """
+    results: List[Optional[str]] = [None] * len(strings)
+    to_translate = []
+    to_translate_indices = []
+    to_translate_items = []
+
+    for i, text in enumerate(strings):
+        if use_cache:
+            cached = lookup_cached_translation(text, target_lang, api)
+            if cached:
+                results[i] = cached
+                continue
+        cleaned_text, items = isolate_html_and_variables(text)
+        to_translate.append(cleaned_text)
+        to_translate_indices.append(i)
+        to_translate_items.append(items)
+
+    return results, to_translate, to_translate_indices, to_translate_items
 
 def translate_string(text: str, target_lang: str = 'es', preserve_formatting: bool = True, api: str = 'deepl', use_cache: bool = True) -> str:
     """
@@ -114,84 +484,43 @@ def translate_string(text: str, target_lang: str = 'es', preserve_formatting: bo
     """
     # Check cache first
     if use_cache:
-        cached = get_cached_translation(text, target_lang, api)
+        cached = lookup_cached_translation(text, target_lang, api)
         if cached:
             logger.debug(f"Cache hit for: {text[:50]}...")
             return cached
 
+    # Send text with tags and variables replaced by placeholders, restored below
+    cleaned_text, items = isolate_html_and_variables(text)
     translated_text = None
 
     if api == 'deepl':
-        import deepl
-        translator = deepl.Translator(os.getenv('DEEPL_API_KEY'))
+        translator = _get_deepl_translator()
+        _throttle()
         result = translator.translate_text(
-            text,
+            cleaned_text,
             target_lang=target_lang,
             preserve_formatting=preserve_formatting
         )
         translated_text = result.text
     elif api == 'deepseek':
-        # Initialize OpenAI client with DeepSeek's base URL
-        client = OpenAI(
-            api_key=os.getenv('DEEPSEEK_API_KEY'),
-            base_url="https://api.deepseek.com"
-        )
-        
-        system_prompt = (
-            "You are a professional translator. Your task is to translate text while preserving HTML tags, "
-            "variables, and placeholders. Do not modify the structure of the text or any technical elements."
-        )
-        
-        print(f"Translating: {text}")
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = client.chat.completions.create(
-                    model="deepseek-chat",
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": f"Translate this text to {target_lang}: {text}"}
-                    ],
-                    temperature=1.3,  # Added recommended temperature for translations
-                    stream=False
-                )
-                # Print raw response for debugging
-                print(f"Raw API Response: {response}")
-                translated_text = response.choices[0].message.content
-                break
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise Exception(f"Failed after {max_retries} retries: {str(e)}")
-                print(f"Retrying ({attempt + 1}/{max_retries})... Error: {str(e)}")
-                time.sleep(2 ** attempt)
+        logger.debug("Translating: %s", text)
+        translated_text = _deepseek_chat(f"Translate this text to {target_lang}: {cleaned_text}")
     elif api == 'azure':
         # Azure Translator logic
         pass
     elif api == 'google':
         try:
-            client = translate_v3.TranslationServiceClient()
-            project_id = os.getenv('GOOGLE_CLOUD_PROJECT')
-            if not project_id:
-                raise ValueError("GOOGLE_CLOUD_PROJECT environment variable is not set")
-            
-            parent = f"projects/{project_id}/locations/global"
-            
-            # Map language codes to Google's format if needed
-            # Google uses ISO-639-1 language codes
-            lang_mapping = {
-                'es_ES': 'es',
-                'en_US': 'en',
-                'fr_FR': 'fr',
-                # Add more mappings as needed
-            }
-            google_lang_code = lang_mapping.get(target_lang, target_lang.split('_')[0].lower())
+            client = _get_google_client()
+            parent = _get_google_parent()
+            google_lang_code = _google_lang_code(target_lang)
             
             # Implement retry logic
             max_retries = 3
             for attempt in range(max_retries):
+                _throttle()
                 try:
                     response = client.translate_text(
-                        contents=[text],
+                        contents=[cleaned_text],
                         target_language_code=google_lang_code,
                         parent=parent,
                         mime_type="text/plain",  # Using plain text since we handle HTML tags separately
@@ -200,7 +529,7 @@ def translate_string(text: str, target_lang: str = 'es', preserve_formatting: bo
                     
                     if response.translations:
                         translated_text = response.translations[0].translated_text
-                        print(f"Translated: {text} -> {translated_text}")
+                        logger.debug("Translated: %s -> %s", text, translated_text)
                         break
                     else:
                         raise Exception("No translation returned from Google API")
@@ -208,7 +537,7 @@ def translate_string(text: str, target_lang: str = 'es', preserve_formatting: bo
                 except Exception as e:
                     if attempt == max_retries - 1:
                         raise Exception(f"Failed after {max_retries} retries: {str(e)}")
-                    print(f"Retrying ({attempt + 1}/{max_retries})... Error: {str(e)}")
+                    logger.warning(f"Retrying ({attempt + 1}/{max_retries})... Error: {str(e)}")
                     time.sleep(2 ** attempt)
 
         except Exception as e:
@@ -217,6 +546,9 @@ def translate_string(text: str, target_lang: str = 'es', preserve_formatting: bo
     else:
         raise ValueError(f"Unsupported API: {api}")
 
+    if translated_text:
+        translated_text = reinsert_html_and_variables(translated_text, items)
+
     # Save to cache before returning
     if translated_text and use_cache:
         save_to_cache(text, target_lang, api, translated_text)
@@ -237,29 +569,19 @@ def translate_batch(strings: List[str], target_lang: str = 'es', api: str = 'dee
         list: List of translated strings.
     """
     if api == 'deepl':
-        import deepl
-        translator = deepl.Translator(os.getenv('DEEPL_API_KEY'))
+        translator = _get_deepl_translator()
 
         # Separate cached and uncached strings
-        results = [None] * len(strings)
-        to_translate = []
-        to_translate_indices = []
-
-        for i, text in enumerate(strings):
-            if use_cache:
-                cached = get_cached_translation(text, target_lang, api)
-                if cached:
-                    results[i] = cached
-                    continue
-            to_translate.append(text)
-            to_translate_indices.append(i)
+        results, to_translate, to_translate_indices, to_translate_items = _prepare_batch(
+            strings, target_lang, api, use_cache)
 
         # Batch translate uncached strings
         if to_translate:
             try:
+                _throttle()
                 translations = translator.translate_text(to_translate, target_lang=target_lang)
-                for idx, translation in zip(to_translate_indices, translations):
-                    translated = translation.text
+                for idx, items, translation in zip(to_translate_indices, to_translate_items, translations):
+                    translated = reinsert_html_and_variables(translation.text, items)
                     results[idx] = translated
                     if use_cache:
                         save_to_cache(strings[idx], target_lang, api, translated)
@@ -272,55 +594,78 @@ def translate_batch(strings: List[str], target_lang: str = 'es', api: str = 'dee
         return results
 
     elif api == 'google':
-        client = translate_v3.TranslationServiceClient()
-        project_id = os.getenv('GOOGLE_CLOUD_PROJECT')
-        parent = f"projects/{project_id}/locations/global"
-
-        lang_mapping = {
-            'es_ES': 'es', 'en_US': 'en', 'fr_FR': 'fr',
-        }
-        google_lang_code = lang_mapping.get(target_lang, target_lang.split('_')[0].lower())
+        client = _get_google_client()
+        parent = _get_google_parent()
+        google_lang_code = _google_lang_code(target_lang)
 
         # Separate cached and uncached strings
-        results = [None] * len(strings)
-        to_translate = []
-        to_translate_indices = []
+        results, to_translate, to_translate_indices, to_translate_items = _prepare_batch(
+            strings, target_lang, api, use_cache)
+
+        # Batch translate, packing requests by item count and UTF-8 payload size
+        batch_start = 0
+        for batch in _pack(to_translate, GOOGLE_MAX_BATCH_BYTES, GOOGLE_MAX_BATCH_ITEMS,
+                           lambda s: len(s.encode('utf-8'))):
+            batch_end = batch_start + len(batch)
+            batch_indices = to_translate_indices[batch_start:batch_end]
+            batch_items = to_translate_items[batch_start:batch_end]
+            batch_start = batch_end
+
+            _throttle()
+            try:
+                response = client.translate_text(
+                    contents=batch,
+                    target_language_code=google_lang_code,
+                    parent=parent,
+                    mime_type="text/plain",
+                    source_language_code="en"
+                )
 
-        for i, text in enumerate(strings):
-            if use_cache:
-                cached = get_cached_translation(text, target_lang, api)
-                if cached:
-                    results[i] = cached
-                    continue
-            to_translate.append(text)
-            to_translate_indices.append(i)
+                for idx, items, translation in zip(batch_indices, batch_items, response.translations):
+                    translated = reinsert_html_and_variables(translation.translated_text, items)
+                    results[idx] = translated
+                    if use_cache:
+                        save_to_cache(strings[idx], target_lang, api, translated)
+            except Exception as e:
+                logger.error(f"Batch translation error: {e}")
+                for idx in batch_indices:
+                    results[idx] = translate_string(strings[idx], target_lang, api=api, use_cache=use_cache)
 
-        # Batch translate (Google supports up to 100 items per request)
-        if to_translate:
-            batch_size = 100
-            for batch_start in range(0, len(to_translate), batch_size):
-                batch_end = min(batch_start + batch_size, len(to_translate))
-                batch = to_translate[batch_start:batch_end]
-                batch_indices = to_translate_indices[batch_start:batch_end]
+        return results
 
-                try:
-                    response = client.translate_text(
-                        contents=batch,
-                        target_language_code=google_lang_code,
-                        parent=parent,
-                        mime_type="text/plain",
-                        source_language_code="en"
-                    )
+    elif api == 'deepseek':
+        # Separate cached and uncached strings
+        results, to_translate, to_translate_indices, to_translate_items = _prepare_batch(
+            strings, target_lang, api, use_cache)
+
+        # Pack similar-length strings into as few prompts as the budget allows
+        ordered = sorted(zip(to_translate_indices, to_translate, to_translate_items), key=lambda item: len(item[1]))
+        offset = 0
+        for chunk in _pack([text for _, text, _ in ordered]):
+            packed = ordered[offset:offset + len(chunk)]
+            chunk_indices = [idx for idx, _, _ in packed]
+            chunk_items = [items for _, _, items in packed]
+            offset += len(chunk)
+
+            translations = None
+            try:
+                content = _deepseek_chat(_format_packed_prompt(chunk, target_lang))
+                translations = _parse_packed_response(content, len(chunk))
+                if translations is None:
+                    logger.warning(f"Could not parse packed response for {len(chunk)} strings")
+            except Exception as e:
+                logger.error(f"Batch translation error: {e}")
 
-                    for idx, translation in zip(batch_indices, response.translations):
-                        translated = translation.translated_text
-                        results[idx] = translated
-                        if use_cache:
-                            save_to_cache(strings[idx], target_lang, api, translated)
-                except Exception as e:
-                    logger.error(f"Batch translation error: {e}")
-                    for idx in batch_indices:
-                        results[idx] = translate_string(strings[idx], target_lang, api=api, use_cache=use_cache)
+            if translations is None:
+                for idx in chunk_indices:
+                    results[idx] = translate_string(strings[idx], target_lang, api=api, use_cache=use_cache)
+                continue
+
+            for idx, items, translated in zip(chunk_indices, chunk_items, translations):
+                translated = reinsert_html_and_variables(translated, items)
+                results[idx] = translated
+                if use_cache:
+                    save_to_cache(strings[idx], target_lang, api, translated)
 
         return results
 
@@ -328,6 +673,26 @@ def translate_batch(strings: List[str], target_lang: str = 'es', api: str = 'dee
         # Fallback to individual translations for other APIs
         return [translate_string(s, target_lang, api=api, use_cache=use_cache) for s in strings]
 
+def group_entries_by_msgid(entries: List[polib.POEntry]) -> Dict[str, List[polib.POEntry]]:
+    """
+    Groups PO entries by msgid so each distinct source string is translated once.
+
+    Args:
+        entries (list): PO entries to group.
+
+    Returns:
+        dict: Mapping of msgid to the entries sharing it, in first-seen order.
+    """
+    groups: Dict[str, List[polib.POEntry]] = {}
+    for entry in entries:
+        groups.setdefault(entry.msgid, []).append(entry)
+    return groups
+
+def apply_translation(entries: List[polib.POEntry], translation: str):
+    """Assigns one translation to every entry that shares its msgid."""
+    for entry in entries:
+        entry.msgstr = translation
+
 def save_progress(output_file: str, translated_count: int):
     """Save translation progress to resume later."""
     progress_file = Path(output_file).with_suffix('.progress')
@@ -337,6 +702,21 @@ def save_progress(output_file: str, translated_count: int):
     except Exception as e:
         logger.warning(f"Failed to save progress: {e}")
 
+def checkpoint(po: polib.POFile, output_file: str, translated_count: int, use_cache: bool):
+    """
+    Persists work done so far so an interrupted run can be resumed.
+
+    With caching enabled only the buffered cache writes and the progress
+    counter are written; finished translations are recovered from the cache
+    on resume. Without a cache the whole PO file has to be saved instead,
+    and --resume copies its translations back (see restore_saved_output).
+    """
+    if use_cache:
+        flush_cache()
+    else:
+        po.save(output_file, newline='\n')
+    save_progress(output_file, translated_count)
+
 def load_progress(output_file: str) -> int:
     """Load translation progress if available."""
     progress_file = Path(output_file).with_suffix('.progress')
@@ -349,14 +729,226 @@ def load_progress(output_file: str) -> int:
             logger.warning(f"Failed to load progress: {e}")
     return 0
 
-def translate_entry_wrapper(args_tuple):
-    """Wrapper for parallel translation."""
-    entry, target_lang, api, use_cache = args_tuple
+def restore_saved_output(po: polib.POFile, output_file: str) -> int:
+    """
+    Copies translations from a checkpointed output file into untranslated entries.
+
+    Entries are matched by msgctxt and msgid, so strings added to the input
+    since the checkpoint are kept and translated normally.
+
+    Returns:
+        int: Number of entries restored.
+    """
     try:
-        translation = translate_string(entry.msgid, target_lang, api=api, use_cache=use_cache)
-        return (entry, translation, None)
+        saved_po = polib.pofile(output_file, wrapwidth=0)
     except Exception as e:
-        return (entry, None, str(e))
+        logger.warning(f"Failed to load saved output: {e}")
+        return 0
+    saved = {(entry.msgctxt, entry.msgid): entry.msgstr for entry in saved_po.translated_entries()}
+    restored = 0
+    for entry in po.untranslated_entries():
+        msgstr = saved.get((entry.msgctxt, entry.msgid))
+        if msgstr:
+            entry.msgstr = msgstr
+            restored += 1
+    return restored
+
+async def _deepseek_chat_async(session: aiohttp.ClientSession, content: str) -> str:
+    """
+    Sends a single chat completion request to DeepSeek over a shared aiohttp session.
+
+    Args:
+        session (aiohttp.ClientSession): Session whose connection pool is reused across requests.
+        content (str): The user message to send.
+
+    Returns:
+        str: The content of the first completion choice.
+    """
+    headers = {'Authorization': f"Bearer {os.getenv('DEEPSEEK_API_KEY')}"}
+    data = {
+        'model': 'deepseek-chat',
+        'messages': [
+            {'role': 'system', 'content': DEEPSEEK_SYSTEM_PROMPT},
+            {'role': 'user', 'content': content}
+        ],
+        'temperature': 1.3,
+        'stream': False
+    }
+
+    max_retries = 3
+    for attempt in range(max_retries):
+        await _throttle_async()
+        try:
+            async with session.post(DEEPSEEK_API_URL, json=data, headers=headers) as r:
+                if r.status == 429 and attempt < max_retries - 1:
+                    # Honor the server's Retry-After and hold back the other workers too
+                    wait = _retry_after_seconds(r.headers.get('Retry-After'), 2 ** attempt)
+                    logger.warning(f"Rate limited, retrying in {wait:.1f}s ({attempt + 1}/{max_retries})")
+                    if _rate_limiter is not None:
+                        _rate_limiter.pause(wait)
+                    await asyncio.sleep(wait)
+                    continue
+                r.raise_for_status()
+                response = await r.json()
+            return response['choices'][0]['message']['content']
+        except Exception as e:
+            if attempt == max_retries - 1:
+                raise Exception(f"Failed after {max_retries} retries: {str(e)}")
+            logger.warning(f"Retrying ({attempt + 1}/{max_retries})... Error: {str(e)}")
+            await asyncio.sleep(2 ** attempt)
+
+async def translate_string_async(text: str, target_lang: str = 'es', preserve_formatting: bool = True, api: str = 'deepl',
+                                 use_cache: bool = True, session: Optional[aiohttp.ClientSession] = None) -> str:
+    """
+    Asynchronous counterpart of translate_string.
+
+    DeepSeek requests go through aiohttp directly; DeepL and Google only ship
+    synchronous SDKs, so those calls run in a worker thread.
+
+    Args:
+        text (str): The string to translate.
+        target_lang (str): Target language code (default: 'es').
+        preserve_formatting (bool): Whether to preserve HTML/php syntax (default: True).
+        api (str): Translation API to use ('deepl', 'deepseek', 'azure', 'google').
+        use_cache (bool): Whether to use caching (default: True).
+        session (aiohttp.ClientSession): Session used for DeepSeek requests (default: shared session).
+
+    Returns:
+        str: The translated string.
+    """
+    if api != 'deepseek':
+        return await asyncio.to_thread(translate_string, text, target_lang, preserve_formatting, api, use_cache)
+
+    if use_cache:
+        cached = lookup_cached_translation(text, target_lang, api)
+        if cached:
+            logger.debug(f"Cache hit for: {text[:50]}...")
+            return cached
+
+    cleaned_text, items = isolate_html_and_variables(text)
+    translated_text = await _deepseek_chat_async(session or _get_http_session(),
+                                                 f"Translate this text to {target_lang}: {cleaned_text}")
+    if translated_text:
+        translated_text = reinsert_html_and_variables(translated_text, items)
+
+    if translated_text and use_cache:
+        save_to_cache(text, target_lang, api, translated_text)
+
+    return translated_text if translated_text else text
+
+async def translate_batch_async(strings: List[str], target_lang: str = 'es', api: str = 'deepl', use_cache: bool = True,
+                                session: Optional[aiohttp.ClientSession] = None) -> List[str]:
+    """
+    Asynchronous counterpart of translate_batch.
+
+    Args:
+        strings (list): List of strings to translate.
+        target_lang (str): Target language code (default: 'es').
+        api (str): Translation API to use ('deepl', 'deepseek', 'google').
+        use_cache (bool): Whether to use caching (default: True).
+        session (aiohttp.ClientSession): Session used for DeepSeek requests (default: shared session).
+
+    Returns:
+        list: List of translated strings.
+    """
+    if api in ['deepl', 'google']:
+        return await asyncio.to_thread(translate_batch, strings, target_lang, api, use_cache)
+
+    if api != 'deepseek':
+        return list(await asyncio.gather(*[
+            translate_string_async(s, target_lang, api=api, use_cache=use_cache, session=session) for s in strings
+        ]))
+
+    session = session or _get_http_session()
+    results, to_translate, to_translate_indices, to_translate_items = _prepare_batch(
+        strings, target_lang, api, use_cache)
+
+    async def translate_chunk(chunk: List[str], chunk_indices: List[int], chunk_items: List[Tuple[str, ...]]):
+        translations = None
+        try:
+            content = await _deepseek_chat_async(session, _format_packed_prompt(chunk, target_lang))
+            translations = _parse_packed_response(content, len(chunk))
+            if translations is None:
+                logger.warning(f"Could not parse packed response for {len(chunk)} strings")
+        except Exception as e:
+            logger.error(f"Batch translation error: {e}")
+
+        if translations is None:
+            translations = await asyncio.gather(*[
+                translate_string_async(strings[idx], target_lang, api=api, use_cache=use_cache, session=session)
+                for idx in chunk_indices
+            ])
+        else:
+            translations = [reinsert_html_and_variables(t, items) for t, items in zip(translations, chunk_items)]
+            if use_cache:
+                for idx, translated in zip(chunk_indices, translations):
+                    save_to_cache(strings[idx], target_lang, api, translated)
+
+        for idx, translated in zip(chunk_indices, translations):
+            results[idx] = translated
+
+    # Pack similar-length strings into as few prompts as the budget allows
+    ordered = sorted(zip(to_translate_indices, to_translate, to_translate_items), key=lambda item: len(item[1]))
+    chunks = []
+    offset = 0
+    for chunk in _pack([text for _, text, _ in ordered]):
+        packed = ordered[offset:offset + len(chunk)]
+        chunks.append((chunk, [idx for idx, _, _ in packed], [items for _, _, items in packed]))
+        offset += len(chunk)
+
+    await asyncio.gather(*[translate_chunk(*chunk) for chunk in chunks])
+    return results
+
+async def _amain(args, po: polib.POFile, groups: Dict[str, List[polib.POEntry]], msgids: List[str],
+                 use_cache: bool):
+    """
+    Translates entries concurrently on a single event loop.
+
+    args.parallel workers pull batches from a shared iterator, so at most that
+    many requests are in flight and only that many tasks exist at any time.
+    All DeepSeek requests reuse the keep-alive connections of the shared
+    aiohttp session. APIs with batch support receive args.batch_size strings
+    per request.
+    """
+    batch_size = args.batch_size if args.api in BATCH_APIS else 1
+    batches = (msgids[i:i + batch_size] for i in range(0, len(msgids), batch_size))
+    progress = tqdm(total=len(msgids), desc="Translating")
+    completed = 0
+    last_checkpoint = time.monotonic()
+
+    session = _get_http_session(args.parallel)
+
+    async def worker():
+        nonlocal completed, last_checkpoint
+        # Workers share one iterator; next() never yields to the loop, so each batch is taken once
+        for batch in batches:
+            try:
+                translations = await translate_batch_async(batch, args.target_lang, api=args.api,
+                                                           use_cache=use_cache, session=session)
+                for msgid, translation in zip(batch, translations):
+                    apply_translation(groups[msgid], translation)
+            except Exception as e:
+                logger.error(f"Error translating batch starting with '{batch[0]}': {str(e)}")
+
+            completed += len(batch)
+            progress.update(len(batch))
+            if time.monotonic() - last_checkpoint > CHECKPOINT_INTERVAL:
+                checkpoint(po, args.output_file, completed, use_cache)
+                last_checkpoint = time.monotonic()
+
+    try:
+        await asyncio.gather(*[worker() for _ in range(args.parallel)])
+    finally:
+        await close_http_session()
+        progress.close()
+
+def run_async(coro):
+    """Runs a coroutine on uvloop when it is installed (it is not available on Windows), else on asyncio's loop."""
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.run(coro)
+    return uvloop.run(coro)
 
 def main():
     # Parse command line arguments
@@ -367,115 +959,129 @@ def main():
                       help='Translation API to use (default: deepl)')
     parser.add_argument('--target-lang', default='es',
                       help='Target language code (default: es)')
-    parser.add_argument('--batch-size', type=int, default=10,
-                      help='Number of strings to translate in a batch (default: 10)')
+    parser.add_argument('--batch-size', type=int, default=None,
+                      help='Number of strings to translate in a batch (default: 100 for google, 10 otherwise)')
     parser.add_argument('--parallel', type=int, default=1,
                       help='Number of parallel translation workers (default: 1)')
     parser.add_argument('--no-cache', action='store_true',
                       help='Disable translation caching')
     parser.add_argument('--resume', action='store_true',
                       help='Resume from previous progress')
-    parser.add_argument('--delay', type=float, default=0.5,
-                      help='Delay between translations in seconds (default: 0.5)')
+    parser.add_argument('--rate', type=float, default=None,
+                      help='Maximum API requests per second, 0 to disable (default: per-API limit)')
+    parser.add_argument('--delay', type=float, default=None,
+                      help='Deprecated: seconds between requests, use --rate instead (sets --rate to 1/DELAY)')
+    parser.add_argument('--verbose', action='store_true',
+                      help='Log each string and raw API response (debug output)')
     args = parser.parse_args()
 
+    if args.verbose:
+        logger.setLevel(logging.DEBUG)
+    if args.batch_size is None:
+        args.batch_size = DEFAULT_BATCH_SIZES.get(args.api, DEFAULT_BATCH_SIZE)
+    # --delay predates the rate limiter; keep old invocations working
+    if args.delay is not None:
+        logger.warning("--delay is deprecated, use --rate (requests per second) instead")
+        if args.rate is None:
+            args.rate = 1 / args.delay if args.delay > 0 else 0
+
     # Load API keys from environment
     load_dotenv()
 
-    # Read and parse PO file
-    po = polib.pofile(args.input_file)
+    # Read and parse PO file; wrapwidth=0 keeps lines unwrapped so saving skips re-wrapping
+    po = polib.pofile(args.input_file, wrapwidth=0)
+    use_cache = not args.no_cache
+
+    # Resume an interrupted run. No msgids are skipped by position, since batches
+    # can finish out of order or fail: with caching, finished strings are answered
+    # from the cache at no API cost; without it, the checkpoints saved the output
+    # PO file, so its translations are copied back before looking for work
+    if args.resume and load_progress(args.output_file) > 0:
+        if use_cache:
+            logger.info("Resuming: finished strings will be taken from the cache")
+        else:
+            restored = restore_saved_output(po, args.output_file)
+            logger.info(f"Resuming: restored {restored} entries from {args.output_file}")
 
     # Get all untranslated entries
     untranslated = po.untranslated_entries()
-    logger.info(f"Found {len(untranslated)} untranslated entries")
 
-    # Load progress if resuming
-    start_index = 0
-    if args.resume:
-        start_index = load_progress(args.output_file)
-        if start_index > 0:
-            logger.info(f"Resuming from entry {start_index}")
-            untranslated = untranslated[start_index:]
+    # Translate each distinct msgid once and fan the result out to all its entries
+    groups = group_entries_by_msgid(untranslated)
+    msgids = list(groups)
+    logger.info(f"Found {len(untranslated)} untranslated entries ({len(msgids)} unique)")
 
-    use_cache = not args.no_cache
+    # Copy strings with nothing to translate straight into msgstr
+    to_translate = []
+    for msgid in msgids:
+        if is_trivial(msgid):
+            apply_translation(groups[msgid], msgid)
+        else:
+            to_translate.append(msgid)
+    if len(to_translate) < len(msgids):
+        logger.info(f"Copied {len(msgids) - len(to_translate)} strings that need no translation")
+    msgids = to_translate
+
+    set_rate_limit(args.rate if args.rate is not None else API_RATE_LIMITS.get(args.api))
+
+    # Checkpoint on elapsed time rather than entry count, so cheap entries don't save too often
+    last_checkpoint = time.monotonic()
+
+    # Use parallel translation if parallel > 1
+    if args.parallel > 1:
+        logger.info(f"Using {args.parallel} parallel workers")
+
+        run_async(_amain(args, po, groups, msgids, use_cache))
 
     # Use batch translation if batch_size > 1 and API supports it
-    if args.batch_size > 1 and args.api in ['deepl', 'google']:
+    elif args.batch_size > 1 and args.api in BATCH_APIS:
         logger.info(f"Using batch translation with batch size: {args.batch_size}")
 
-        for batch_start in tqdm(range(0, len(untranslated), args.batch_size), desc="Translating batches"):
-            batch_end = min(batch_start + args.batch_size, len(untranslated))
-            batch = untranslated[batch_start:batch_end]
+        for batch_start in tqdm(range(0, len(msgids), args.batch_size), desc="Translating batches"):
+            batch_end = min(batch_start + args.batch_size, len(msgids))
+            batch = msgids[batch_start:batch_end]
 
             try:
-                msgids = [entry.msgid for entry in batch]
-                translations = translate_batch(msgids, args.target_lang, api=args.api, use_cache=use_cache)
+                translations = translate_batch(batch, args.target_lang, api=args.api, use_cache=use_cache)
 
-                for entry, translation in zip(batch, translations):
-                    entry.msgstr = translation
+                for msgid, translation in zip(batch, translations):
+                    apply_translation(groups[msgid], translation)
 
                 # Save progress periodically
-                if (batch_start + args.batch_size) % 50 == 0:
-                    po.save(args.output_file)
-                    save_progress(args.output_file, start_index + batch_end)
-
-                time.sleep(args.delay)
+                if time.monotonic() - last_checkpoint > CHECKPOINT_INTERVAL:
+                    checkpoint(po, args.output_file, batch_end, use_cache)
+                    last_checkpoint = time.monotonic()
 
             except Exception as e:
                 logger.error(f"Error in batch translation: {str(e)}")
                 # Fallback to individual translation
-                for entry in batch:
+                for msgid in batch:
                     try:
-                        entry.msgstr = translate_string(entry.msgid, args.target_lang, api=args.api, use_cache=use_cache)
-                        time.sleep(args.delay)
+                        translation = translate_string(msgid, args.target_lang, api=args.api, use_cache=use_cache)
+                        apply_translation(groups[msgid], translation)
                     except Exception as e2:
-                        logger.error(f"Error translating '{entry.msgid}': {str(e2)}")
+                        logger.error(f"Error translating '{msgid}': {str(e2)}")
                         continue
 
-    # Use parallel translation if parallel > 1
-    elif args.parallel > 1:
-        logger.info(f"Using {args.parallel} parallel workers")
-
-        with ThreadPoolExecutor(max_workers=args.parallel) as executor:
-            futures = []
-            for entry in untranslated:
-                future = executor.submit(translate_entry_wrapper, (entry, args.target_lang, args.api, use_cache))
-                futures.append(future)
-
-            completed = 0
-            for future in tqdm(as_completed(futures), total=len(futures), desc="Translating"):
-                entry, translation, error = future.result()
-                if error:
-                    logger.error(f"Error translating '{entry.msgid}': {error}")
-                else:
-                    entry.msgstr = translation
-
-                completed += 1
-                if completed % 50 == 0:
-                    po.save(args.output_file)
-                    save_progress(args.output_file, start_index + completed)
-
-                time.sleep(args.delay / args.parallel)  # Adjust delay for parallel workers
-
     # Standard sequential translation
     else:
-        for idx, entry in enumerate(tqdm(untranslated, desc="Translating")):
+        for idx, msgid in enumerate(tqdm(msgids, desc="Translating")):
             try:
-                entry.msgstr = translate_string(entry.msgid, args.target_lang, api=args.api, use_cache=use_cache)
+                translation = translate_string(msgid, args.target_lang, api=args.api, use_cache=use_cache)
+                apply_translation(groups[msgid], translation)
 
                 # Save progress periodically
-                if (idx + 1) % 50 == 0:
-                    po.save(args.output_file)
-                    save_progress(args.output_file, start_index + idx + 1)
-
-                time.sleep(args.delay)
+                if time.monotonic() - last_checkpoint > CHECKPOINT_INTERVAL:
+                    checkpoint(po, args.output_file, idx + 1, use_cache)
+                    last_checkpoint = time.monotonic()
 
             except Exception as e:
-                logger.error(f"Error translating '{entry.msgid}': {str(e)}")
+                logger.error(f"Error translating '{msgid}': {str(e)}")
                 continue
 
     # Save final translated file
-    po.save(args.output_file)
+    po.save(args.output_file, newline='\n')
+    flush_cache()
     logger.info(f"Translation complete. Saved to {args.output_file}")
 
     # Clean up progress file
@@ -1,88 +1,595 @@
 # Script: translate-po.py
 # Purpose: Translates untranslated entries in a PO file using DeepL API
-# Dependencies: polib, deepl, python-dotenv, tqdm
+# Dependencies: polib, aiohttp, python-dotenv, tqdm
+# Optional: google-re2 (linear-time regex engine for the placeholder patterns)
 
 import argparse
+import asyncio
+import json
 import os
+import re
+import shutil
+import subprocess
+import sys
+from collections import defaultdict
+from xml.etree.ElementTree import iterparse  # Streaming parser for TMX translation memories
 from dotenv import load_dotenv  # type: ignore  # Handles environment variables
 import polib  # Handles PO file operations
-import deepl  # DeepL API client
+import aiohttp  # Async HTTP client for the DeepL REST API
 from tqdm import tqdm  # Progress bar functionality
 
+# PLACEHOLDER_PATTERN and MASK_PATTERN run once per msgid, mostly on short UI strings,
+# so the speed gain is small; RE2 mainly guarantees that an unusually long msgid
+# cannot make matching slow. google-re2 is optional and re is used without it.
+try:
+    import re2 as regex_engine
+except ImportError:
+    regex_engine = re
+
+# Load environment variables from .env file once at import time
+# File should contain: DEEPL_API_KEY=your_api_key
+# or, to spread requests over several keys: DEEPL_API_KEYS=key1,key2
+load_dotenv()
+
+# DeepL REST endpoints
+# Free-tier keys end in ":fx" and must use the api-free host
+DEEPL_API_URL = 'https://api.deepl.com/v2/translate'
+DEEPL_FREE_API_URL = 'https://api-free.deepl.com/v2/translate'
+HTTP_TIMEOUT = 60
+
+# Placeholders DeepL must not translate or reorder internally
+# printf-style (%s, %d, positional %1$s) and ICU/format-style ({0})
+# They are sent as empty <x id="N"></x> elements, which DeepL is told to leave untouched
+# An explicit closing tag is needed: in HTML mode <x/> would open an element
+# and the text after it would be treated as ignored content
+# All placeholder kinds share one alternation, so each msgid is scanned once
+PLACEHOLDER_PATTERN = regex_engine.compile(r'%\d+\$[sd]|%[sd]|\{\d+\}')
+# Accepts <x id="N"></x>, <x id="N"/> and <x id="N">, whichever form DeepL returns
+MASK_PATTERN = regex_engine.compile(r'<x id="(\d+)"\s*/?>(?:</x>)?')
+
+# Attribute holding the language of a TMX <tuv> element (xml:lang)
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+# Transient DeepL failures are retried with exponential backoff (1, 2, 4, 8 s)
+# 429 = too many requests, 5xx = server busy or unavailable
+MAX_RETRIES = 5
+MAX_RETRY_DELAY = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Errors that affect every request made with the key (bad key, quota exceeded),
+# so retrying the texts of a failed batch one by one would only fail again
+KEY_ERROR_STATUSES = {401, 403, 456}
+
+# DeepL accepts up to 50 texts per request and a request body of up to 128 KiB
+# Batch sizes are measured on the JSON-encoded, placeholder-masked texts (see request_size)
+# and kept well below the limit to leave room for the rest of the request body
+BATCH_SIZE = 50
+MAX_BATCH_BYTES = 70 * 1024
+
+# Number of translated entries between checkpoint saves of the partial output file
+CHECKPOINT_ENTRIES = 200
+
+# Number of batches translated concurrently per API key
+# DeepL calls are network-bound, so overlapping requests hide the waiting time
+DEFAULT_WORKERS = 10
+
+def pack_msgids(msgids, max_count=BATCH_SIZE, max_bytes=MAX_BATCH_BYTES, size_of=None):
+    """
+    Packs msgids into as few DeepL requests as possible (first-fit decreasing).
+    Msgids are placed longest first into the first batch that still has room
+    for both another text and its size, so short strings fill the space
+    left over by long ones instead of opening new requests.
+    size_of gives the bytes a msgid adds to the request body (default: request_size).
+    A msgid larger than max_bytes on its own gets a batch to itself.
+    Batches hold msgids, so results map back to entries by msgid.
+    """
+    size_of = size_of or request_size
+    batches = []
+    open_batches = []  # [size, msgids] pairs that can still take msgids
+    for msgid_size, msgid in sorted(((size_of(msgid), msgid) for msgid in msgids),
+                                    reverse=True):
+        for batch in open_batches:
+            if batch[0] + msgid_size <= max_bytes:
+                batch[0] += msgid_size
+                batch[1].append(msgid)
+                break
+        else:
+            batch = [msgid_size, [msgid]]
+            batches.append(batch[1])
+            open_batches.append(batch)
+        # Full batches are dropped from the search so it stays short
+        if len(batch[1]) >= max_count:
+            open_batches.remove(batch)
+    return batches
+
+def load_cache(cache_file):
+    """
+    Loads previously saved translations into a dict keyed by (msgid, target_lang).
+    On disk the cache is stored as {target_lang: {msgid: translation}}.
+    Returns an empty cache if the file is missing or unreadable.
+    """
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {
+        (msgid, lang): translation
+        for lang, translations in data.items()
+        for msgid, translation in translations.items()
+    }
+
+def save_cache(cache, cache_file):
+    """
+    Saves the translation cache to disk so later runs can reuse it.
+    """
+    data = {}
+    for (msgid, lang), translation in cache.items():
+        data.setdefault(lang, {})[msgid] = translation
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+def primary_language(code):
+    """
+    Returns the lower-case primary language subtag, e.g. 'PT-BR' -> 'pt'.
+    """
+    return code.lower().replace('_', '-').split('-')[0]
+
+def load_tmx(tmx_file, target_lang):
+    """
+    Loads a TMX translation memory into a dict of source text -> translation.
+    Only translation units with a segment in target_lang are kept; languages
+    are matched on their primary subtag, so ES also matches es-ES and es-MX.
+    The file is parsed incrementally and each <tu> is detached from <body>
+    once read, so large memories do not have to fit in memory as an XML tree.
+    """
+    target = primary_language(target_lang)
+    source_lang = ''
+    body = None
+    memory = {}
+    for event, elem in iterparse(tmx_file, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'header':
+                source_lang = primary_language(elem.get('srclang', ''))
+            elif elem.tag == 'body':
+                body = elem
+            continue
+        if elem.tag != 'tu':
+            continue
+        source = translation = None
+        for tuv in elem.iter('tuv'):
+            seg = tuv.find('seg')
+            if seg is None:
+                continue
+            lang = primary_language(tuv.get(XML_LANG) or tuv.get('lang') or '')
+            text = ''.join(seg.itertext())
+            if lang == target:
+                translation = text
+            elif source is None and source_lang in ('', '*all*', lang):
+                source = text
+        if source and translation:
+            memory.setdefault(source, translation)
+        # Clearing only the <tu> would leave an empty element per unit attached to <body>
+        # Every unit before this one has already been processed, so <body> can be emptied
+        if body is not None:
+            body.clear()
+        else:
+            elem.clear()
+    return memory
+
+def group_entries_by_msgid(entries):
+    """
+    Groups PO entries that share the same msgid.
+    Each distinct msgid is translated once and the result copied to every entry.
+    """
+    groups = defaultdict(list)
+    for entry in entries:
+        groups[entry.msgid].append(entry)
+    return groups
+
+def get_api_keys():
+    """
+    Reads DeepL API keys from the environment.
+    DEEPL_API_KEYS holds a comma-separated list of keys to spread requests over;
+    DEEPL_API_KEY is used when it is not set.
+    """
+    keys = os.getenv('DEEPL_API_KEYS') or os.getenv('DEEPL_API_KEY') or ''
+    return [key.strip() for key in keys.split(',') if key.strip()]
+
+# DeepL API keys read from the environment, shared by every translate_po() call
+API_KEYS = get_api_keys()
+
+def has_placeholders(msgid):
+    """
+    Returns True if the msgid contains printf or ICU placeholders.
+    """
+    return PLACEHOLDER_PATTERN.search(msgid) is not None
+
+def mask_placeholders(text):
+    """
+    Replaces placeholders with numbered <x id="N"></x> tags.
+    Returns the masked text and the placeholders in order of their ids.
+    """
+    placeholders = []
+    def to_tag(match):
+        placeholders.append(match.group(0))
+        return f'<x id="{len(placeholders) - 1}"></x>'
+    return PLACEHOLDER_PATTERN.sub(to_tag, text), placeholders
+
+def unmask_placeholders(text, placeholders):
+    """
+    Restores the placeholders replaced by mask_placeholders().
+    Tags with an unknown id (e.g. literal <x> markup in the msgid) are left untouched.
+    """
+    if not placeholders:
+        return text
+    def replace(match):
+        index = int(match.group(1))
+        return placeholders[index] if index < len(placeholders) else match.group(0)
+    return MASK_PATTERN.sub(replace, text)
+
+def request_size(msgid):
+    """
+    Returns the bytes a msgid adds to a DeepL request body.
+    Measured on the text actually sent: placeholders become <x id="N"></x> tags
+    and aiohttp's JSON encoding escapes quotes and non-ASCII characters,
+    plus the separator between texts in the list.
+    """
+    masked, _ = mask_placeholders(msgid)
+    return len(json.dumps(masked)) + 2
+
+def deepl_api_url(api_key):
+    """
+    Returns the DeepL translate endpoint matching the key's plan.
+    """
+    return DEEPL_FREE_API_URL if api_key.endswith(':fx') else DEEPL_API_URL
+
+async def translate_batch(session, api_keys, batch, target_lang):
+    """
+    Translates a batch of msgids in a single DeepL request.
+    Results are returned in the same order as the batch.
+    An API key is borrowed from the api_keys queue for the duration of each
+    attempt, so requests are spread over all configured keys and each key
+    has at most as many requests in flight as it appears in the queue.
+    Rate limits, server errors and network errors are retried up to
+    MAX_RETRIES times; other HTTP errors (e.g. 403, 456) fail immediately.
+    Placeholders are masked as ignored tags so DeepL keeps them intact.
+    """
+    masked = [mask_placeholders(msgid) for msgid in batch]
+    payload = {
+        'text': [text for text, _ in masked],
+        'target_lang': target_lang,
+        'preserve_formatting': True
+    }
+    # Tag handling is only requested when needed, so plain strings are sent as text
+    # HTML mode is used instead of XML because msgids often contain unclosed tags like <br>
+    if any(placeholders for _, placeholders in masked):
+        payload['tag_handling'] = 'html'
+        payload['ignore_tags'] = ['x']
+
+    for attempt in range(MAX_RETRIES):
+        api_key = await api_keys.get()
+        try:
+            # preserve_formatting=True ensures HTML tags remain intact
+            async with session.post(
+                deepl_api_url(api_key),
+                headers={'Authorization': f'DeepL-Auth-Key {api_key}'},
+                json=payload
+            ) as response:
+                if response.status not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    data = await response.json()
+                    return [
+                        unmask_placeholders(translation['text'], placeholders)
+                        for translation, (_, placeholders) in zip(data['translations'], masked)
+                    ]
+                error = f"HTTP {response.status}"
+                # DeepL sends Retry-After as whole seconds
+                retry_after = response.headers.get('Retry-After', '')
+                delay = int(retry_after) if retry_after.isdigit() else 2 ** attempt
+        except aiohttp.ClientResponseError:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = str(e) or type(e).__name__
+            delay = 2 ** attempt
+        finally:
+            api_keys.put_nowait(api_key)
+
+        if attempt == MAX_RETRIES - 1:
+            raise RuntimeError(f"DeepL request failed after {MAX_RETRIES} attempts: {error}")
+        await asyncio.sleep(min(delay, MAX_RETRY_DELAY))
+
+def save_po(po, output_file):
+    """
+    Saves the PO file atomically.
+    The file is written to a temporary path and then moved over output_file,
+    so an interrupted save never leaves a truncated output behind.
+    """
+    tmp_file = output_file + '.tmp'
+    po.save(tmp_file)
+    os.replace(tmp_file, output_file)
+
+def rewrap_po(po_file, width):
+    """
+    Re-wraps a PO file in place with gettext's msgcat.
+    polib saves unwrapped lines (wrapwidth=0); msgcat's C implementation
+    wraps the whole file far faster than polib's textwrap-based saving.
+
+    Raises:
+        RuntimeError: If msgcat is not installed or fails
+    """
+    msgcat = shutil.which('msgcat')
+    if msgcat is None:
+        raise RuntimeError("msgcat not found; install gettext to re-wrap the output")
+    try:
+        subprocess.run([msgcat, f'--width={width}', '-o', po_file, po_file],
+                       check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"msgcat failed: {e.stderr.strip()}") from e
+
+def restore_partial(po, partial_file):
+    """
+    Copies translations saved by an interrupted run into the freshly loaded PO file.
+    Only entries still untranslated in po are filled, matched by msgctxt and msgid,
+    so strings added to the input since the checkpoint are kept and translated.
+    Returns the number of entries restored.
+    """
+    try:
+        partial = polib.pofile(partial_file, wrapwidth=0, check_for_duplicates=False)
+    except Exception as e:
+        print(f"Ignoring unreadable partial output {partial_file}: {e}")
+        return 0
+    saved = {
+        (entry.msgctxt, entry.msgid): entry.msgstr
+        for entry in partial.translated_entries()
+    }
+    restored = 0
+    for entry in po.untranslated_entries():
+        msgstr = saved.get((entry.msgctxt, entry.msgid))
+        if msgstr:
+            entry.msgstr = msgstr
+            restored += 1
+    return restored
+
+async def translate_pending(batches, groups, cache, api_keys, target_lang, workers, progress,
+                            checkpoint=None):
+    """
+    Translates batches of msgids concurrently and applies the results.
+    All requests share one aiohttp session, so connections are kept alive
+    and reused; each API key serves up to workers requests at a time.
+    Translations are copied to every entry sharing the msgid and cached.
+    checkpoint, if given, is called every CHECKPOINT_ENTRIES translated entries.
+    If DeepL rejects a batch (e.g. 400 for one malformed text), its msgids are
+    retried one per request so only the offending strings are lost.
+    Returns the msgids that could not be translated.
+    """
+    key_pool = asyncio.Queue()
+    for _ in range(workers):
+        for api_key in api_keys:
+            key_pool.put_nowait(api_key)
+
+    connector = aiohttp.TCPConnector(limit=len(api_keys) * workers)
+    timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+    failed = []
+    since_checkpoint = 0
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def translate_and_apply(batch):
+            nonlocal since_checkpoint
+            try:
+                translations = await translate_batch(session, key_pool, batch, target_lang)
+            except aiohttp.ClientResponseError as e:
+                if len(batch) > 1 and e.status not in KEY_ERROR_STATUSES:
+                    # The request was rejected as a whole; fall back to one msgid per request
+                    print(f"\nError translating batch: {e}; retrying its strings individually")
+                    await asyncio.gather(*(translate_and_apply([msgid]) for msgid in batch))
+                    return
+                print(f"\nError translating batch: {e}")
+                print(f"First text in batch: {batch[0]}")
+                failed.extend(batch)
+            except Exception as e:
+                # Log error and continue with other batches once retries are exhausted
+                print(f"\nError translating batch: {e}")
+                print(f"First text in batch: {batch[0]}")
+                failed.extend(batch)
+            else:
+                # Copy each translation to every entry sharing the msgid and remember it
+                for msgid, translation in zip(batch, translations):
+                    for entry in groups[msgid]:
+                        entry.msgstr = translation
+                    cache[(msgid, target_lang)] = translation
+                # Save partial results so a crash only loses the work since the last checkpoint
+                since_checkpoint += sum(len(groups[msgid]) for msgid in batch)
+                if checkpoint is not None and since_checkpoint >= CHECKPOINT_ENTRIES:
+                    since_checkpoint = 0
+                    checkpoint()
+            progress.update(sum(len(groups[msgid]) for msgid in batch))
+
+        await asyncio.gather(*(translate_and_apply(batch) for batch in batches))
+    return failed
+
+def save_failed(failed, failed_file):
+    """
+    Records msgids that could not be translated so they can be reviewed.
+    They are not cached, so the next run sends them to DeepL again.
+    Removes a stale failure log when every msgid was translated.
+    """
+    if failed:
+        with open(failed_file, 'w', encoding='utf-8') as f:
+            json.dump(failed, f, ensure_ascii=False, indent=2)
+        print(f"\n{len(failed)} strings could not be translated, see: {failed_file}")
+    elif os.path.exists(failed_file):
+        os.remove(failed_file)
+
+def translate_po(input_file, target_lang='ES', api_keys=None, workers=DEFAULT_WORKERS, memory=None):
+    """
+    Translates the untranslated entries of a PO file with DeepL.
+    Can be called repeatedly from a driver script, e.g. for every PO file in
+    a directory; pass the same translation memory to avoid reloading it.
+    Workflow:
+    1. Read and parse PO file (or the partially translated output of an earlier run)
+    2. Translate each distinct untranslated msgid in concurrent batches,
+       reusing cached translations and translation memory matches
+    3. Save translated file and translation cache
+    Progress is checkpointed to {output_file}.partial every CHECKPOINT_ENTRIES
+    translated entries; the partial file is removed once the output is saved.
+
+    Args:
+        input_file: Path to the PO file to translate
+        target_lang: DeepL target language code
+        api_keys: DeepL API keys to spread requests over (default: API_KEYS)
+        workers: Number of concurrent DeepL requests per API key
+        memory: Translation memory dict of msgid -> translation (see load_tmx)
+
+    Returns:
+        Path of the translated PO file
+
+    Raises:
+        RuntimeError: If no API key is configured or the PO file cannot be loaded or saved
+    """
+    api_keys = api_keys or API_KEYS
+    memory = memory or {}
+    if not api_keys:
+        raise RuntimeError("DEEPL_API_KEY not found in .env file")
+
+    # Create output filename
+    # Appends target language code to original filename
+    # Example: messages.po -> messages_ES.po
+    base_name = os.path.splitext(input_file)[0]
+    output_file = f"{base_name}_{target_lang}.po"
+    failed_file = f"{base_name}_{target_lang}.failed.json"
+    partial_file = output_file + '.partial'
+
+    # Load and parse the PO file
+    # polib handles the complexities of PO file format
+    # wrapwidth=0 keeps msgid/msgstr lines unwrapped, so saving skips line-wrapping work
+    # Duplicate checks are skipped because entries are only edited in place, never appended
+    try:
+        po = polib.pofile(input_file, wrapwidth=0, check_for_duplicates=False)
+    except Exception as e:
+        raise RuntimeError(f"Error loading PO file: {e}") from e
+
+    # Resume an interrupted run from its checkpoint
+    # The input is always loaded, so strings added since then are still translated
+    if os.path.exists(partial_file):
+        restored = restore_partial(po, partial_file)
+        print(f"Resuming from {partial_file}: {restored} entries restored")
+
+    # Load translations cached by earlier runs
+    # Repeated msgids (e.g. "Save", "%s") are only sent to DeepL once
+    # Example: messages.po -> messages.trcache.json
+    cache_file = f"{base_name}.trcache.json"
+    cache = load_cache(cache_file)
+
+    # Translate untranslated entries in batches
+    # One request per batch instead of per entry saves a network round-trip per string
+    # Batches are sent concurrently from an asyncio event loop over one pooled HTTP session
+    # Uses tqdm to show progress bar during translation
+    # The bar redraws at most every 0.5 s and is disabled when stderr is not a terminal (CI, logs)
+    # The untranslated entries are collected once; the file is only saved after translation
+    # Entries sharing a msgid are grouped so each distinct msgid is sent only once
+    entries = po.untranslated_entries()
+    groups = group_entries_by_msgid(entries)
+    print(f"Translating to {target_lang}...")
+    try:
+        with tqdm(total=len(entries), mininterval=0.5, miniters=max(1, len(entries) // 200),
+                  smoothing=0.05, disable=not sys.stderr.isatty()) as progress:
+            # Fill cached and translation memory msgids right away; only the rest are batched for DeepL
+            pending = []
+            for msgid, group in groups.items():
+                translation = cache.get((msgid, target_lang))
+                if translation is None:
+                    translation = memory.get(msgid)
+                if translation is None:
+                    pending.append(msgid)
+                    continue
+                for entry in group:
+                    entry.msgstr = translation
+                progress.update(len(group))
+            # Pack msgids with placeholders separately, so only their requests need tag handling
+            batches = (pack_msgids([msgid for msgid in pending if not has_placeholders(msgid)])
+                       + pack_msgids([msgid for msgid in pending if has_placeholders(msgid)]))
+
+            failed = []
+            if batches:
+                failed = asyncio.run(translate_pending(
+                    batches, groups, cache, api_keys,
+                    target_lang, workers, progress,
+                    checkpoint=lambda: save_po(po, partial_file)
+                ))
+    finally:
+        # Save the cache even if translation was interrupted
+        try:
+            save_cache(cache, cache_file)
+        except Exception as e:
+            print(f"Error saving translation cache: {e}")
+
+    # Log msgids that still failed after retrying
+    # Example: messages.po -> messages_ES.failed.json
+    save_failed(failed, failed_file)
+
+    # Save the translated PO file
+    # Creates new file with _ES suffix
+    # The checkpoint is no longer needed once the full output is written
+    try:
+        save_po(po, output_file)
+    except Exception as e:
+        raise RuntimeError(f"Error saving translated file: {e}") from e
+    if os.path.exists(partial_file):
+        os.remove(partial_file)
+    return output_file
+
 def main():
     """
     Main function that handles the PO file translation process.
     Workflow:
     1. Parse command line arguments
-    2. Load DeepL API key from environment
-    3. Read and parse PO file
-    4. Translate untranslated entries
-    5. Save translated file
+    2. Check that DeepL API keys were found in the environment
+    3. Load the translation memory, if one was given
+    4. Translate the PO file with translate_po()
+    5. Optionally re-wrap the output with msgcat
     """
     # Set up command line argument parsing
     # Required: input_file - Path to the PO file to translate
     # Optional: target-lang - Target language code (defaults to ES for Spanish)
+    # Optional: workers - Number of concurrent DeepL requests per API key (defaults to 10)
+    # Optional: tmx - TMX translation memory consulted before calling DeepL
+    # Optional: wrap-width - Re-wrap the output with msgcat (e.g. 78 to match gettext tools)
     parser = argparse.ArgumentParser(description='Translate PO file using DeepL API')
     parser.add_argument('input_file', help='Input PO file to translate')
     parser.add_argument('--target-lang', default='ES',
                        help='Target language code (default: ES)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                       help=f'Number of concurrent DeepL requests per API key (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--tmx',
+                       help='TMX translation memory to take existing translations from')
+    parser.add_argument('--wrap-width', type=int,
+                       help='Re-wrap the output with msgcat at this width (default: unwrapped)')
     args = parser.parse_args()
 
-    # Load API key from .env file
-    # File should contain: DEEPL_API_KEY=your_api_key
-    load_dotenv()
-    api_key = os.getenv('DEEPL_API_KEY')
-
-    if not api_key:
+    # API keys are loaded from .env at import time
+    if not API_KEYS:
         print("Error: DEEPL_API_KEY not found in .env file")
         exit(1)
 
-    # Initialize DeepL translator with API key
-    # This will be used for all translation operations
-    translator = deepl.Translator(api_key)
-
-    # Load and parse the PO file
-    # polib handles the complexities of PO file format
-    try:
-        po = polib.pofile(args.input_file)
-    except Exception as e:
-        print(f"Error loading PO file: {e}")
-        exit(1)
-
-    # Create output filename
-    # Appends target language code to original filename
-    # Example: messages.po -> messages_ES.po
-    base_name = os.path.splitext(args.input_file)[0]
-    output_file = f"{base_name}_{args.target_lang}.po"
-
-    # Translate each untranslated entry
-    # Uses tqdm to show progress bar during translation
-    print(f"Translating to {args.target_lang}...")
-    for entry in tqdm(po.untranslated_entries()):
+    # Load the translation memory, if one was given
+    # Exact msgid matches are taken from it without calling DeepL
+    memory = {}
+    if args.tmx:
         try:
-            # Translate the source text (msgid)
-            # preserve_formatting=True ensures HTML tags remain intact
-            translation = translator.translate_text(
-                entry.msgid,
-                target_lang=args.target_lang,
-                preserve_formatting=True
-            )
-            # Update the PO entry with translated text
-            entry.msgstr = translation.text
+            memory = load_tmx(args.tmx, args.target_lang)
+            print(f"Loaded {len(memory)} translation memory entries from {args.tmx}")
         except Exception as e:
-            # Log error and continue with next entry if translation fails
-            print(f"\nError translating entry: {e}")
-            print(f"Problematic text: {entry.msgid}")
-            continue
+            print(f"Error loading translation memory: {e}")
+            exit(1)
 
-    # Save the translated PO file
-    # Creates new file with _ES suffix
     try:
-        po.save(output_file)
-        print(f"\nTranslation completed. Output saved to: {output_file}")
-    except Exception as e:
-        print(f"Error saving translated file: {e}")
+        output_file = translate_po(args.input_file, args.target_lang,
+                                   workers=args.workers, memory=memory)
+        if args.wrap_width:
+            rewrap_po(output_file, args.wrap_width)
+    except RuntimeError as e:
+        print(e)
         exit(1)
+    print(f"\nTranslation completed. Output saved to: {output_file}")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()